@@ -4,6 +4,7 @@
 #define GL_ARRAY_BUFFER               0x8892
 #define GL_ELEMENT_ARRAY_BUFFER       0x8893
 #define GL_STATIC_DRAW                0x88E4
+#define GL_DYNAMIC_DRAW               0x88E8
 #define GL_FLOAT                      0x1406
 #define GL_TRIANGLES                  0x0004
 #define GL_UNSIGNED_SHORT             0x1403
@@ -33,6 +34,7 @@ extern void gl_bind_buffer(int target, int bid);
 extern void gl_buffer_data(int target, const void* ptr, int byteLen, int usage);
 extern void gl_enable_vertex_attrib_array(int loc);
 extern void gl_vertex_attrib_pointer(int loc, int size, int type, int normalized, int stride, int offset);
+extern void gl_vertex_attrib_divisor(int loc, int divisor);
 
 extern int  gl_create_vertex_array(void);
 extern void gl_bind_vertex_array(int vid);
@@ -41,13 +43,11 @@ extern int  gl_get_uniform_location(int pid, const char* name);
 extern void gl_uniform_matrix4fv(int uid, int transpose, const float* m);
 extern void gl_uniform1i(int uid, int x);
 extern void gl_uniform3f(int uid, float x, float y, float z);
-extern void gl_uniform4f(int uid, float x, float y, float z, float w);
 
 extern void gl_viewport(int x, int y, int w, int h);
 extern void gl_clear_color(float r, float g, float b, float a);
 extern void gl_clear(int mask);
-extern void gl_draw_elements(int mode, int count, int type, int offset);
-extern void gl_draw_arrays(int mode, int first, int count);
+extern void gl_draw_elements_instanced(int mode, int count, int type, int offset, int instances);
 extern unsigned int now_ms(void);
 
 // Minimal libc replacements (avoid JS shims and imports)
@@ -69,16 +69,11 @@ enum Dir { DIR_NONE=0, DIR_UP=1, DIR_RIGHT=2, DIR_DOWN=3, DIR_LEFT=4 };
 
 // -------------------------------------------------
 // Globals
-static int prog;                 // rectangles program
-static int u_rect, u_color, u_res;
-static int vbo_pos, ebo, vao;
-static int a_pos_loc = 0;
-
-static int prog_tri;             // triangles program (pixel coords)
-static int u_res_tri, u_color_tri;
-static int tri_vao, tri_vbo;
-static int a_pos_tri = 0;
+static int prog;                 // instanced quad/triangle program
+static int u_res;
+static int vbo_pos, vbo_inst, ebo, vao;
 static int vp_w = 1, vp_h = 1;
+static int needs_redraw = 1;     // see mark_dirty()
 
 static int turns = 0;
 static int eaten = 0;
@@ -113,6 +108,11 @@ static void u32_to_str(unsigned v, char* buf, int n) {
     while (v && i>=0) { buf[i--] = '0' + (v%10); v/=10; }
 }
 
+// Call wherever on-screen state changes (JS too, after writing the board heap);
+// frame() skips drawing otherwise.
+__attribute__((export_name("mark_dirty")))
+void mark_dirty(void) { needs_redraw = 1; }
+
 static void set_mode_label_js(void) {
     if (mode_routing) set_mode_label("Routing");
     else set_mode_label("Placement");
@@ -146,56 +146,64 @@ static int make_program(const char* vs, const char* fs) {
 }
 
 // -------------------------------------------------
-// Simple 2D pipeline (rects in pixel space)
+// Batched 2D pipeline: every shape is one instance of a unit quad in pixel space.
+// Triangles collapse the quad's far edge to a point; rot turns the shape in
+// quarter steps inside its box. Instances draw in order, so painter's order holds.
 static const char* vs_src =
     "#version 300 es\n"
     "precision mediump float;\n"
-    "in vec2 a_pos;\n" // unit quad (0..1)
-    "uniform vec4 u_rect;\n"       // x,y,w,h in pixels
+    "in vec2 a_pos;\n"             // unit quad (0..1)
+    "in vec4 a_rect;\n"            // x,y,w,h in pixels (per instance)
+    "in vec4 a_color;\n"
+    "in vec2 a_shape;\n"           // rot (quarter turns), 0=rect 1=triangle
     "uniform vec3 u_res;\n"        // viewport w,h,unused
+    "out vec4 v_color;\n"
     "void main(){\n"
-    "  vec2 p = u_rect.xy + a_pos * u_rect.zw;\n"
+    "  vec2 uv = a_pos;\n"
+    "  if (a_shape.y > 0.5 && uv.x > 0.5) uv.y = 0.5;\n"
+    "  int rot = int(a_shape.x);\n"
+    "  if (rot == 1) uv = vec2(uv.y, 1.0 - uv.x);\n"
+    "  else if (rot == 2) uv = 1.0 - uv;\n"
+    "  else if (rot == 3) uv = vec2(1.0 - uv.y, uv.x);\n"
+    "  vec2 p = a_rect.xy + uv * a_rect.zw;\n"
     "  vec2 ndc = vec2(p.x / u_res.x * 2.0 - 1.0, 1.0 - p.y / u_res.y * 2.0);\n"
     "  gl_Position = vec4(ndc, 0.0, 1.0);\n"
+    "  v_color = a_color;\n"
     "}\n";
 
 static const char* fs_src =
     "#version 300 es\n"
     "precision mediump float;\n"
-    "uniform vec4 u_color;\n"
+    "in vec4 v_color;\n"
     "out vec4 frag;\n"
-    "void main(){ frag = u_color; }\n";
+    "void main(){ frag = v_color; }\n";
+
+#define MAX_INSTANCES 1024
+typedef struct { float x, y, w, h; float r, g, b, a; float rot, shape; } Inst;
+static Inst inst[MAX_INSTANCES];
+static int inst_count = 0;
+
+static void flush_instances(void) {
+    if (!inst_count) return;
+    gl_bind_buffer(GL_ARRAY_BUFFER, vbo_inst);
+    gl_buffer_data(GL_ARRAY_BUFFER, inst, inst_count*(int)sizeof(Inst), GL_DYNAMIC_DRAW);
+    gl_draw_elements_instanced(GL_TRIANGLES, 6, GL_UNSIGNED_SHORT, 0, inst_count);
+    inst_count = 0;
+}
 
-static void draw_rect(float x, float y, float w, float h, float r, float g, float b, float a) {
-    gl_bind_vertex_array(vao);
-    gl_uniform4f(u_rect, x, y, w, h);
-    gl_uniform4f(u_color, r, g, b, a);
-    gl_draw_elements(GL_TRIANGLES, 6, GL_UNSIGNED_SHORT, 0);
+static void push_instance(float x, float y, float w, float h, float r, float g, float b, float a, int rot, int shape) {
+    if (inst_count == MAX_INSTANCES) flush_instances();
+    Inst* q = &inst[inst_count++];
+    q->x=x; q->y=y; q->w=w; q->h=h; q->r=r; q->g=g; q->b=b; q->a=a; q->rot=(float)rot; q->shape=(float)shape;
 }
 
-// Triangles (pixel coordinates)
-static const char* vs_tri =
-    "#version 300 es\n"
-    "precision mediump float;\n"
-    "in vec2 a_pos;\n"
-    "uniform vec3 u_res;\n"
-    "void main(){\n"
-    "  vec2 ndc = vec2(a_pos.x / u_res.x * 2.0 - 1.0, 1.0 - a_pos.y / u_res.y * 2.0);\n"
-    "  gl_Position = vec4(ndc, 0.0, 1.0);\n"
-    "}\n";
+static void draw_rect(float x, float y, float w, float h, float r, float g, float b, float a) {
+    push_instance(x, y, w, h, r, g, b, a, 0, 0);
+}
 
-static void draw_triangle(float x1,float y1,float x2,float y2,float x3,float y3, float r,float g,float b,float a){
-    float verts[6] = {x1,y1,x2,y2,x3,y3};
-    gl_use_program(prog_tri);
-    gl_uniform3f(u_res_tri, (float)vp_w, (float)vp_h, 0.0f);
-    gl_uniform4f(u_color_tri, r,g,b,a);
-    gl_bind_vertex_array(tri_vao);
-    gl_bind_buffer(GL_ARRAY_BUFFER, tri_vbo);
-    gl_buffer_data(GL_ARRAY_BUFFER, verts, sizeof(verts), GL_STATIC_DRAW);
-    gl_enable_vertex_attrib_array(a_pos_tri);
-    gl_vertex_attrib_pointer(a_pos_tri, 2, GL_FLOAT, 0, 2*sizeof(float), 0);
-    gl_draw_arrays(GL_TRIANGLES, 0, 3);
-    gl_use_program(prog);
+// Isosceles triangle filling its box; rot 0=tip right, 1=up, 2=left, 3=down
+static void draw_triangle(float x, float y, float w, float h, int rot, float r, float g, float b, float a) {
+    push_instance(x, y, w, h, r, g, b, a, rot, 1);
 }
 
 // -------------------------------------------------
@@ -260,22 +268,22 @@ static void draw_arrow(int gx, int gy, int dir) {
         case DIR_RIGHT: {
             draw_hline(x+m, x+tile_px-m-head*0.9f, cy, t);
             float tipx = x+tile_px-m; float base = tipx - head;
-            draw_triangle(tipx,cy, base, cy-head*0.65f, base, cy+head*0.65f, 0,0,0,1);
+            draw_triangle(base, cy-head*0.65f, head, head*1.3f, 0, 0,0,0,1);
         } break;
         case DIR_LEFT: {
             draw_hline(x+m+head*0.9f, x+tile_px-m, cy, t);
-            float tipx = x+m; float base = tipx + head;
-            draw_triangle(tipx,cy, base, cy+head*0.65f, base, cy-head*0.65f, 0,0,0,1);
+            float tipx = x+m;
+            draw_triangle(tipx, cy-head*0.65f, head, head*1.3f, 2, 0,0,0,1);
         } break;
         case DIR_UP: {
             draw_vline(y+m+head*0.9f, y+tile_px-m, cx, t);
-            float tipy = y+m; float base = tipy + head;
-            draw_triangle(cx,tipy, cx+head*0.65f, base, cx-head*0.65f, base, 0,0,0,1);
+            float tipy = y+m;
+            draw_triangle(cx-head*0.65f, tipy, head*1.3f, head, 1, 0,0,0,1);
         } break;
         case DIR_DOWN: {
             draw_vline(y+m, y+tile_px-m-head*0.9f, cx, t);
             float tipy = y+tile_px-m; float base = tipy - head;
-            draw_triangle(cx,tipy, cx-head*0.65f, base, cx+head*0.65f, base, 0,0,0,1);
+            draw_triangle(cx-head*0.65f, base, head*1.3f, head, 3, 0,0,0,1);
         } break;
     }
 }
@@ -312,27 +320,91 @@ static void place_random_pieces(int count){
 }
 
 // ----------------------------------
-// History for step backward
-#define MAX_HISTORY 2048
-typedef struct { unsigned char occ[H][W]; unsigned char collided[H][W]; int eaten; } Snap;
-static Snap history[MAX_HISTORY];
-static int hist_len = 0; // number of saved pre-step states
-
-static void push_history(void){
-    if (hist_len >= MAX_HISTORY) return;
-    for (int y=0;y<H;y++) for (int x=0;x<W;x++){ history[hist_len].occ[y][x]=occ[y][x]; history[hist_len].collided[y][x]=collided[y][x]; }
-    history[hist_len].eaten = eaten;
-    hist_len++;
+// Undo log: ring buffer of per-action deltas, oldest records evicted when full.
+// Record: [turned u8][eaten u16][n u16] n*[cell u16][flip bits u8] [n u16]
+// Flip bits are XORed back on undo (occ, collided, and the old^new direction).
+#ifndef HISTORY_BYTES
+#define HISTORY_BYTES 65536
+#endif
+#define H_OCC 1
+#define H_COL 2
+#define H_DIR_SHIFT 2
+#define REC_SIZE(n) (7u + 3u*(unsigned)(n))
+static unsigned char hist_buf[HISTORY_BYTES];
+static unsigned int hist_head = 0, hist_used = 0; // oldest byte, bytes in use
+static unsigned char rec_buf[REC_SIZE(W*H)];
+static int rec_n = 0;
+static unsigned char dir_shadow[H][W]; // dir_map as of the last record (JS writes dir_map directly)
+
+static unsigned int hist_at(unsigned int i){ return hist_buf[(hist_head + i) % HISTORY_BYTES]; }
+static unsigned int hist_u16(unsigned int i){ return hist_at(i) | (hist_at(i+1) << 8); }
+
+static void clear_history(void){
+    hist_head = 0; hist_used = 0;
+    for (int y=0;y<H;y++) for (int x=0;x<W;x++) dir_shadow[y][x]=dir_map[y][x];
+}
+
+static void rec_cell(int idx, int bits){
+    unsigned char* e = rec_buf + 5 + 3*rec_n++;
+    e[0]=(unsigned char)idx; e[1]=(unsigned char)(idx>>8); e[2]=(unsigned char)bits;
+}
+
+static void rec_commit(int turned, int eaten_delta){
+    if (rec_n==0 && !turned) return;
+    unsigned int size = REC_SIZE(rec_n);
+    rec_buf[0]=(unsigned char)turned;
+    rec_buf[1]=(unsigned char)eaten_delta; rec_buf[2]=(unsigned char)(eaten_delta>>8);
+    rec_buf[3]=(unsigned char)rec_n; rec_buf[4]=(unsigned char)(rec_n>>8);
+    rec_buf[size-2]=rec_buf[3]; rec_buf[size-1]=rec_buf[4];
+    if (size > HISTORY_BYTES) { clear_history(); return; }
+    while (HISTORY_BYTES - hist_used < size) { // evict oldest
+        unsigned int old = REC_SIZE(hist_u16(3));
+        hist_head = (hist_head + old) % HISTORY_BYTES; hist_used -= old;
+    }
+    for (unsigned int i=0;i<size;i++) hist_buf[(hist_head + hist_used + i) % HISTORY_BYTES] = rec_buf[i];
+    hist_used += size;
+}
+
+// Record occupancy/collision changes against a pre-step copy of the board
+static void record_step(unsigned char pocc[H][W], unsigned char pcol[H][W], int turned, int eaten_delta){
+    rec_n = 0;
+    for (int y=0;y<H;y++) for (int x=0;x<W;x++) {
+        int bits = (pocc[y][x]!=occ[y][x] ? H_OCC : 0) | (pcol[y][x]!=collided[y][x] ? H_COL : 0);
+        if (bits) rec_cell(y*W+x, bits);
+    }
+    rec_commit(turned, eaten_delta);
 }
+
+// Record direction edits since the last record as one undoable action
+__attribute__((export_name("sync_dirs")))
+void sync_dirs(void){
+    rec_n = 0;
+    for (int y=0;y<H;y++) for (int x=0;x<W;x++) {
+        int d = dir_map[y][x] ^ dir_shadow[y][x];
+        if (d) { rec_cell(y*W+x, d << H_DIR_SHIFT); dir_shadow[y][x]=dir_map[y][x]; }
+    }
+    rec_commit(0, 0);
+}
+
 static int pop_history(void){
-    if (hist_len <= 0) return 0;
-    hist_len--;
-    for (int y=0;y<H;y++) for (int x=0;x<W;x++){ occ[y][x]=history[hist_len].occ[y][x]; collided[y][x]=history[hist_len].collided[y][x]; }
-    eaten = history[hist_len].eaten;
-    // recompute pieces_remaining
-    int pr=0; for (int y=0;y<H;y++) for (int x=0;x<W;x++) if (occ[y][x]) pr++;
-    pieces_remaining = pr;
-    if (turns>0) turns--; running = 0; // stop auto-run on manual back
+    sync_dirs(); // unrecorded direction writes are undone first
+    if (hist_used == 0) return 0;
+    mark_dirty();
+    unsigned int n = hist_u16(hist_used-2);
+    unsigned int start = hist_used - REC_SIZE(n);
+    for (unsigned int k=0;k<n;k++){
+        unsigned int e = start + 5 + 3*k;
+        int idx = (int)hist_u16(e); int bits = (int)hist_at(e+2);
+        int y = idx / W, x = idx % W;
+        if (bits & H_OCC) { occ[y][x] ^= 1; pieces_remaining += occ[y][x] ? 1 : -1; }
+        if (bits & H_COL) collided[y][x] ^= 1;
+        dir_map[y][x] ^= (unsigned char)(bits >> H_DIR_SHIFT);
+        dir_shadow[y][x] = dir_map[y][x];
+    }
+    eaten -= (int)hist_u16(start+1);
+    if (hist_at(start) && turns>0) turns--;
+    hist_used = start;
+    running = 0; // stop auto-run on manual back
     return 1;
 }
 
@@ -410,9 +482,12 @@ static int dy_for(int dir){ return dir==DIR_DOWN  ? 1 : dir==DIR_UP   ? -1 : 0;
 
 static int step_once(void) {
     // Save current state for undo
-    push_history();
+    sync_dirs();
+    unsigned char prev_occ[H][W], prev_col[H][W];
+    mark_dirty(); // even a rejected step flashes and may clear the output tile
+    for (int y=0;y<H;y++) for (int x=0;x<W;x++) { prev_occ[y][x]=occ[y][x]; prev_col[y][x]=collided[y][x]; }
     // Remove any piece that was on the output tile at the start of the turn
-    if (occ[OUT_Y][OUT_X]) occ[OUT_Y][OUT_X] = 0;
+    if (occ[OUT_Y][OUT_X]) { occ[OUT_Y][OUT_X] = 0; pieces_remaining--; }
 
     unsigned short nextc[H][W];
     for (int y=0;y<H;y++) for (int x=0;x<W;x++) { nextc[y][x]=0; collided[y][x]=0; }
@@ -420,10 +495,10 @@ static int step_once(void) {
     // Plan moves
     for (int y=0;y<H;y++) for (int x=0;x<W;x++) if (occ[y][x]) {
         int dir = dir_map[y][x];
-        if (dir==DIR_NONE) { invalid_flash = 0.65f; return 0; }
+        if (dir==DIR_NONE) { invalid_flash = 0.65f; record_step(prev_occ, prev_col, 0, 0); return 0; }
         int nx = x + dx_for(dir);
         int ny = y + dy_for(dir);
-        if (nx<0||nx>=W||ny<0||ny>=H) { invalid_flash = 0.65f; return 0; }
+        if (nx<0||nx>=W||ny<0||ny>=H) { invalid_flash = 0.65f; record_step(prev_occ, prev_col, 0, 0); return 0; }
         nextc[ny][nx]++;
     }
 
@@ -441,6 +516,7 @@ static int step_once(void) {
     eaten += new_eaten;
     turns++;
     pieces_remaining = remaining;
+    record_step(prev_occ, prev_col, 1, new_eaten);
     if (remaining == 0) running = 0; // stop when board is clear
     return 1;
 }
@@ -470,17 +546,18 @@ void on_pointer(int x, int y, int type, int buttons, int mods) {
     int reverse = (mods & 1) ? 1 : 0; // shift = reverse cycle
     if (!mode_routing) {
         // Placement: toggle piece
-        occ[ty][tx] = occ[ty][tx] ? 0 : 1;
-        // recompute pieces_remaining lazily
-        int pr=0; for(int j=0;j<H;j++) for(int i=0;i<W;i++) if (occ[j][i]) pr++; pieces_remaining=pr;
-        hist_len = 0; // editing invalidates history
+        occ[ty][tx] ^= 1;
+        pieces_remaining += occ[ty][tx] ? 1 : -1;
+        rec_n = 0; rec_cell(ty*W+tx, H_OCC); rec_commit(0, 0);
+        mark_dirty();
     } else {
         // Routing: cycle direction
         int order[] = {DIR_NONE, DIR_UP, DIR_RIGHT, DIR_DOWN, DIR_LEFT};
         int n=5, idx=0; for(int i=0;i<n;i++){ if(order[i]==dir_map[ty][tx]){ idx=i; break; }}
         idx = reverse ? (idx-1+n)%n : (idx+1)%n;
         dir_map[ty][tx] = order[idx];
-        hist_len = 0; // editing invalidates history
+        sync_dirs();
+        mark_dirty();
     }
     last_tx = tx; last_ty = ty;
 }
@@ -488,6 +565,7 @@ void on_pointer(int x, int y, int type, int buttons, int mods) {
 __attribute__((export_name("on_key")))
 void on_key(int code, int down) {
     if (!down) return;
+    mark_dirty();
     if (code=='M') { // toggle mode
         mode_routing = !mode_routing; set_mode_label_js();
     } else if (code==' '||code==32) {
@@ -499,24 +577,29 @@ void on_key(int code, int down) {
     } else if (code=='R') {
         // reset state but keep routing
         for (int y=0;y<H;y++) for (int x=0;x<W;x++) occ[y][x]=0;
-        turns=0; eaten=0; running=0; invalid_flash=0.0f; hist_len=0;
+        pieces_remaining=0;
+        turns=0; eaten=0; running=0; invalid_flash=0.0f; clear_history();
     } else if (code=='C') {
-        for (int y=0;y<H;y++) for (int x=0;x<W;x++) occ[y][x]=0;
-        hist_len=0;
+        // recorded as one undoable edit
+        unsigned char prev_occ[H][W];
+        for (int y=0;y<H;y++) for (int x=0;x<W;x++) { prev_occ[y][x]=occ[y][x]; occ[y][x]=0; }
+        pieces_remaining=0;
+        record_step(prev_occ, collided, 0, 0);
     } else if (code=='D') {
+        sync_dirs(); // keep earlier JS writes as their own record
         for (int y=0;y<H;y++) for (int x=0;x<W;x++) dir_map[y][x]=DIR_NONE;
-        hist_len=0;
+        sync_dirs();
     } else if (code>='0' && code<='9') {
         int n = (code=='0') ? 10 : (code - '0');
         place_random_pieces(n);
-        turns=0; eaten=0; running=0; invalid_flash=0.0f; hist_len=0;
+        turns=0; eaten=0; running=0; invalid_flash=0.0f; clear_history();
     }
 }
 
 // -------------------------------------------------
 // Exports
 __attribute__((export_name("set_viewport")))
-void set_viewport(int w, int h) { vp_w=w; vp_h=h; }
+void set_viewport(int w, int h) { vp_w=w; vp_h=h; mark_dirty(); }
 
 __attribute__((export_name("init")))
 void init(void) {
@@ -526,10 +609,11 @@ void init(void) {
     // Program
     prog = make_program(vs_src, fs_src);
     gl_use_program(prog);
-    u_rect  = gl_get_uniform_location(prog, "u_rect");
-    u_color = gl_get_uniform_location(prog, "u_color");
-    u_res   = gl_get_uniform_location(prog, "u_res");
-    a_pos_loc = gl_get_attrib_location(prog, "a_pos");
+    u_res = gl_get_uniform_location(prog, "u_res");
+    int a_pos   = gl_get_attrib_location(prog, "a_pos");
+    int a_rect  = gl_get_attrib_location(prog, "a_rect");
+    int a_color = gl_get_attrib_location(prog, "a_color");
+    int a_shape = gl_get_attrib_location(prog, "a_shape");
 
     // Unit quad
     float quad[8] = {0,0, 1,0, 0,1, 1,1};
@@ -539,33 +623,35 @@ void init(void) {
     vbo_pos = gl_gen_buffer();
     gl_bind_buffer(GL_ARRAY_BUFFER, vbo_pos);
     gl_buffer_data(GL_ARRAY_BUFFER, quad, sizeof(quad), GL_STATIC_DRAW);
-    gl_enable_vertex_attrib_array(a_pos_loc);
-    gl_vertex_attrib_pointer(a_pos_loc, 2, GL_FLOAT, 0, 2*sizeof(float), 0);
+    gl_enable_vertex_attrib_array(a_pos);
+    gl_vertex_attrib_pointer(a_pos, 2, GL_FLOAT, 0, 2*sizeof(float), 0);
     ebo = gl_gen_buffer();
     gl_bind_buffer(GL_ELEMENT_ARRAY_BUFFER, ebo);
     gl_buffer_data(GL_ELEMENT_ARRAY_BUFFER, idx, sizeof(idx), GL_STATIC_DRAW);
 
-    // Triangles program
-    prog_tri = make_program(vs_tri, fs_src);
-    u_res_tri   = gl_get_uniform_location(prog_tri, "u_res");
-    u_color_tri = gl_get_uniform_location(prog_tri, "u_color");
-    tri_vao = gl_create_vertex_array();
-    gl_bind_vertex_array(tri_vao);
-    tri_vbo = gl_gen_buffer();
-    gl_bind_buffer(GL_ARRAY_BUFFER, tri_vbo);
-    a_pos_tri = gl_get_attrib_location(prog_tri, "a_pos");
-    gl_enable_vertex_attrib_array(a_pos_tri);
-    gl_vertex_attrib_pointer(a_pos_tri, 2, GL_FLOAT, 0, 2*sizeof(float), 0);
+    // Per-instance attributes (rewritten every drawn frame)
+    vbo_inst = gl_gen_buffer();
+    gl_bind_buffer(GL_ARRAY_BUFFER, vbo_inst);
+    gl_enable_vertex_attrib_array(a_rect);
+    gl_vertex_attrib_pointer(a_rect, 4, GL_FLOAT, 0, sizeof(Inst), 0);
+    gl_vertex_attrib_divisor(a_rect, 1);
+    gl_enable_vertex_attrib_array(a_color);
+    gl_vertex_attrib_pointer(a_color, 4, GL_FLOAT, 0, sizeof(Inst), 4*sizeof(float));
+    gl_vertex_attrib_divisor(a_color, 1);
+    gl_enable_vertex_attrib_array(a_shape);
+    gl_vertex_attrib_pointer(a_shape, 2, GL_FLOAT, 0, sizeof(Inst), 8*sizeof(float));
+    gl_vertex_attrib_divisor(a_shape, 1);
 
     // Clear state
     for (int y=0;y<H;y++) for (int x=0;x<W;x++) { occ[y][x]=0; dir_map[y][x]=DIR_NONE; collided[y][x]=0; }
     pieces_remaining = 0;
+    clear_history();
     rng_seed(now_ms() ^ 0xA53u);
 }
 
 __attribute__((export_name("frame")))
 void frame(float dt) {
-    if (invalid_flash>0.0f) { invalid_flash -= dt; if (invalid_flash<0) invalid_flash=0; }
+    if (invalid_flash>0.0f) { invalid_flash -= dt; if (invalid_flash<0) invalid_flash=0; mark_dirty(); }
     if (running) {
         step_accum += dt;
         const float step_hz = 0.35f;
@@ -575,8 +661,12 @@ void frame(float dt) {
         }
     }
 
+    if (!needs_redraw) return; // the browser keeps showing the last frame
+    needs_redraw = 0;
+
     compute_layout();
     gl_use_program(prog);
+    gl_bind_vertex_array(vao);
     gl_uniform3f(u_res, (float)vp_w, (float)vp_h, 0.0f);
     gl_clear(GL_COLOR_BUFFER_BIT);
 
@@ -591,6 +681,7 @@ void frame(float dt) {
         float a = invalid_flash * 0.8f;
         draw_rect(board_x, board_y, board_w, board_h, 0.9f, 0.2f, 0.2f, a);
     }
+    flush_instances();
 }
 
 // --- AI INTEGRATION EXPORTS ---
@@ -163,6 +163,7 @@ const imports = {
     gl_vertex_attrib_pointer: (loc, size, type, normalized, stride, offset) => {
       gl.vertexAttribPointer(loc, size, type, !!normalized, stride, offset);
     },
+    gl_vertex_attrib_divisor: (loc, divisor) => { gl.vertexAttribDivisor(loc, divisor); },
 
     // VAO
     gl_create_vertex_array: () => { const v = gl.createVertexArray(); vaos.push(v); return vaos.length - 1; },
@@ -178,14 +179,14 @@ const imports = {
     },
     gl_uniform1i: (uid, x) => { gl.uniform1i(uniforms[uid], x); },
     gl_uniform3f: (uid, x, y, z) => { gl.uniform3f(uniforms[uid], x, y, z); },
-    gl_uniform4f: (uid, x, y, z, w) => { gl.uniform4f(uniforms[uid], x, y, z, w); },
 
     // State + draw
     gl_viewport: (x, y, w, h) => { gl.viewport(x, y, w, h); },
     gl_clear_color: (r,g,b,a) => { gl.clearColor(r,g,b,a); },
         gl_clear: (mask) => { gl.clear(mask); },
-        gl_draw_elements: (mode, count, type, offset) => { gl.drawElements(mode, count, type, offset); },
-        gl_draw_arrays: (mode, first, count) => { gl.drawArrays(mode, first, count); },
+        gl_draw_elements_instanced: (mode, count, type, offset, instances) => {
+          gl.drawElementsInstanced(mode, count, type, offset, instances);
+        },
 
     // Constants passthrough (for completeness if needed)
     now_ms: () => performance.now(),
@@ -286,53 +287,129 @@ function tick(tNow) {
 requestAnimationFrame(tick);
 
 // --- AI INTEGRATION LOGIC ---
-async function updateAI() {
-  if (!wasm) return;
+// Streaming session: the server keeps the board, so each update sends only the
+// tiles that changed since the last message and receives only changed directions.
+// Falls back to the stateless HTTP endpoint while the socket is unavailable.
+// Replies carry the seq of the message they answer; dirSeq[i] is the seq of the
+// last message that sent tile i, so a reply never clobbers a newer edit.
+const aiSession = {
+  ws: null, open: false, sent: null, seq: 0, dirSeq: new Uint32Array(BOARD_SIZE),
+  retryAt: 0, backoffMs: 1000,
+};
+const AI_SESSION_MAX_BACKOFF_MS = 5 * 60 * 1000;
+
+function openAISession() {
+  if (aiSession.ws || typeof WebSocket === 'undefined') return;
+  if (performance.now() < aiSession.retryAt) return;
+  const url = new URL(`${API_BASE}/session`, window.location.href);
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+  const ws = new WebSocket(url);
+  aiSession.ws = ws;
+  ws.addEventListener('open', () => { aiSession.open = true; aiSession.backoffMs = 1000; });
+  ws.addEventListener('message', e => {
+    const msg = JSON.parse(e.data);
+    applyAIChanges(msg.seq, msg.changes || []);
+  });
+  ws.addEventListener('close', () => {
+    if (!aiSession.open) {
+      // Handshake failed (e.g. server without /session): back off before retrying.
+      aiSession.retryAt = performance.now() + aiSession.backoffMs;
+      aiSession.backoffMs = Math.min(aiSession.backoffMs * 2, AI_SESSION_MAX_BACKOFF_MS);
+    }
+    // Server-side state is gone; the next update starts over with a full sync.
+    aiSession.ws = null; aiSession.open = false; aiSession.sent = null;
+  });
+}
 
-  // 1. Get Memory Pointers
-  const occPtr = wasm.exports.get_board_ptr();
+function applyAIChanges(seq, changes) {
+  // Session replies are [index, dir] pairs already in env dir codes (1-4).
+  if (!aiSession.sent) return; // session was reset; nothing to reconcile against
   const dirPtr = wasm.exports.get_dir_ptr();
+  const heap = u8();
+  for (const [i, d] of changes) {
+    // A later message already overrode this tile on the server.
+    if (aiSession.dirSeq[i] > seq) continue;
+    // Only take the AI's value if the tile was not edited locally since the
+    // last send; otherwise the local edit goes out with the next delta.
+    if (heap[dirPtr + i] === aiSession.sent.dir[i]) heap[dirPtr + i] = d;
+    aiSession.sent.dir[i] = d;
+  }
+  wasm.exports.sync_dirs(); // record as one undoable edit
+  wasm.exports.mark_dirty();
+}
 
-  // 2. Read current state from WASM memory
-  const boardData = Array.from(u8().subarray(occPtr, occPtr + BOARD_SIZE));
-  const dirData = Array.from(u8().subarray(dirPtr, dirPtr + BOARD_SIZE));
+function diffPairs(before, after) {
+  const out = [];
+  for (let i = 0; i < BOARD_SIZE; i++) {
+    if (before[i] !== after[i]) out.push([i, after[i]]);
+  }
+  return out;
+}
+
+async function updateAI() {
+  if (!wasm) return;
+
+  const state = snapshotBoardState();
+  if (aiSession.open) {
+    const prev = aiSession.sent;
+    const seq = ++aiSession.seq;
+    aiSession.sent = state;
+    let msg;
+    if (prev) {
+      const directions = diffPairs(prev.dir, state.dir);
+      for (const [i] of directions) aiSession.dirSeq[i] = seq;
+      msg = { type: 'delta', seq, board: diffPairs(prev.occ, state.occ), directions };
+    } else {
+      aiSession.dirSeq.fill(seq);
+      msg = { type: 'sync', seq, board: Array.from(state.occ), directions: Array.from(state.dir) };
+    }
+    aiSession.ws.send(JSON.stringify(msg));
+    return;
+  }
+  openAISession();
 
-  // 3. Send to Python Server
+  // Send full state to the Python server
   try {
     const response = await fetch(`${API_BASE}/get_action`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({
-        board: boardData,
-        directions: dirData
+        board: Array.from(state.occ),
+        directions: Array.from(state.dir)
       })
     });
 
     const result = await response.json();
 
-    // 4. Write new directions back to WASM memory
+    // Write new directions back to WASM memory
     // RL policy outputs 0-3, but the sim expects 1-4 (DIR_UP..DIR_LEFT).
     const newDirs = result.new_directions;
+    const dirPtr = wasm.exports.get_dir_ptr();
     const heap = u8();
     for (let i = 0; i < BOARD_SIZE; i++) {
         const a = newDirs[i];
         heap[dirPtr + i] = (a >= 0 && a <= 3) ? (a + 1) : a; // map to env dir codes
     }
+    wasm.exports.sync_dirs();
+    wasm.exports.mark_dirty();
 
   } catch (err) {
     console.error("AI Update Failed:", err);
   }
 }
+openAISession();
 
 function randomizeRouting() {
   if (!wasm) return;
-  // Clear routing to reset history/invalid flashes, then fill with random 1-4 dirs.
-  wasm.exports.on_key('D'.charCodeAt(0), 1);
+  // Fill with random 1-4 dirs; sync_dirs records the fill as one undoable edit.
+  wasm.exports.sync_dirs(); // keep earlier unrecorded writes as their own record
   const dirPtr = wasm.exports.get_dir_ptr();
   const heap = u8();
   for (let i = 0; i < BOARD_SIZE; i++) {
     heap[dirPtr + i] = 1 + Math.floor(Math.random() * 4);
   }
+  wasm.exports.sync_dirs();
+  wasm.exports.mark_dirty();
 }
 
 if (randomRoutesBtn) {
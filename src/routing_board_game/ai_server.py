@@ -1,10 +1,11 @@
+import asyncio
 import os
 from pathlib import Path
 from typing import Optional
 
 import numpy as np
-from flask import Flask, jsonify, request, send_from_directory
-from flask_cors import CORS
+from quart import Quart, jsonify, request, send_from_directory, websocket
+from quart_cors import cors
 from stable_baselines3 import PPO
 
 # Constants for the board layout
@@ -24,12 +25,62 @@ def _resolve_static_root(static_root: Optional[str | Path]) -> Path:
     return Path(static_root).resolve()
 
 
+def _predict_directions(model, board: np.ndarray, directions: np.ndarray) -> np.ndarray:
+    """Run the policy on a (H, W) board/directions pair and return raw actions (0-3)."""
+    # edit_mask mirrors the board because the AI can edit tiles with pieces on them
+    edit_mask = board.copy()
+    obs = {"board": board, "directions": directions, "edit_mask": edit_mask}
+    action, _ = model.predict(obs, deterministic=True)
+    return np.asarray(action, dtype=np.uint8).reshape(H, W)
+
+
+class GameSession:
+    """Server-side board state for one streaming client.
+
+    The client sends ``sync`` (full board/directions) once, then ``delta``
+    messages holding only the ``[index, value]`` pairs that changed. Replies
+    carry only the directions the policy changed, in env codes (1-4).
+    """
+
+    def __init__(self):
+        self.board = np.zeros((H, W), dtype=np.uint8)
+        self.directions = np.zeros((H, W), dtype=np.uint8)
+
+    def apply(self, data: dict) -> None:
+        kind = data.get("type")
+        if kind == "sync":
+            self.board = np.array(data["board"], dtype=np.uint8).reshape(H, W)
+            self.directions = np.array(data["directions"], dtype=np.uint8).reshape(H, W)
+        elif kind == "delta":
+            self._apply_changes(self.board, data.get("board", []))
+            self._apply_changes(self.directions, data.get("directions", []))
+        else:
+            raise ValueError(f"unknown message type {kind!r}")
+
+    @staticmethod
+    def _apply_changes(grid: np.ndarray, changes) -> None:
+        flat = grid.reshape(-1)
+        for idx, value in changes:
+            idx = int(idx)
+            if not 0 <= idx < flat.size:
+                raise ValueError(f"tile index {idx} out of range")
+            flat[idx] = int(value)
+
+    def route(self, model) -> list[list[int]]:
+        # RL policy outputs 0-3, but the sim expects 1-4 (DIR_UP..DIR_LEFT).
+        new_directions = _predict_directions(model, self.board, self.directions) + 1
+        changed = np.flatnonzero(new_directions != self.directions)
+        self.directions = new_directions
+        flat = new_directions.reshape(-1)
+        return [[int(i), int(flat[i])] for i in changed]
+
+
 def create_app(
     model_path: str,
     static_root: Optional[str | Path] = None,
     base_path: str = "",
-) -> Flask:
-    """Create a Flask app that serves the routing AI."""
+) -> Quart:
+    """Create a Quart app that serves the routing AI."""
     static_root_path = _resolve_static_root(static_root)
     static_root_str = str(static_root_path)
     base = _normalize_base_path(base_path)
@@ -45,25 +96,25 @@ def create_app(
     except Exception as exc:
         raise RuntimeError(f"Could not load model from '{model_file}': {exc}") from exc
 
-    app = Flask(__name__, static_folder=static_root_str)
+    app = Quart(__name__, static_folder=static_root_str)
 
     # Allow browser clients (GitHub Pages, etc.) to call the API
-    CORS(app)
+    app = cors(app)
 
     @app.route(base or "/", methods=["GET"])
-    def index():
+    async def index():
         if base:
             return jsonify({"status": "ok", "base_path": base})
-        return send_from_directory(static_root_str, "index.html")
+        return await send_from_directory(static_root_str, "index.html")
 
     if not base:
 
         @app.route("/<path:path>")
-        def serve_static(path):
-            return send_from_directory(static_root_str, path)
+        async def serve_static(path):
+            return await send_from_directory(static_root_str, path)
 
     @app.route(f"{base}/get_action", methods=["POST", "GET"])
-    def get_action():
+    async def get_action():
         if request.method != "POST":
             return jsonify(
                 {
@@ -71,7 +122,7 @@ def create_app(
                     "message": "POST board/directions JSON to this endpoint",
                 }
             )
-        data = request.json or {}
+        data = await request.get_json() or {}
 
         try:
             board = np.array(data["board"], dtype=np.uint8).reshape(H, W)
@@ -79,12 +130,23 @@ def create_app(
         except Exception as exc:
             raise RuntimeError(f"Invalid payload for /get_action: {exc}") from exc
 
-        # edit_mask mirrors the board because the AI can edit tiles with pieces on them
-        edit_mask = board.copy()
-        obs = {"board": board, "directions": directions, "edit_mask": edit_mask}
-
-        action, _ = model.predict(obs, deterministic=True)
-        return jsonify({"new_directions": action.tolist()})
+        # Inference is CPU-bound; keep it off the event loop
+        action = await asyncio.to_thread(_predict_directions, model, board, directions)
+        return jsonify({"new_directions": action.reshape(-1).tolist()})
+
+    @app.websocket(f"{base}/session")
+    async def session():
+        state = GameSession()
+        while True:
+            try:
+                data = await websocket.receive_json()
+                state.apply(data)
+            except Exception as exc:
+                raise RuntimeError(f"Invalid payload for /session: {exc}") from exc
+            changes = await asyncio.to_thread(state.route, model)
+            await websocket.send_json(
+                {"type": "directions", "seq": data.get("seq"), "changes": changes}
+            )
 
     return app
 
@@ -97,7 +159,7 @@ def start_route_ai_server(
     static_root: Optional[str | Path] = None,
     base_path: str = "",
 ) -> None:
-    """Start the routing AI Flask server."""
+    """Start the routing AI Quart server."""
     base = base_path or os.getenv("NIFTY_BASE_PATH", "")
     app = create_app(model_path=model_path, static_root=static_root, base_path=base)
     print(f"Starting AI Game Server on http://{host}:{port}")
@@ -66,7 +66,7 @@ def play(model_path):
     help="Optional base path if served behind a path prefix (e.g., /nifty-ai).",
 )
 def start_route_ai(model_path, host, port, base_path):
-    """Start a Flask server that serves routing actions."""
+    """Start a Quart server that serves routing actions."""
     try:
         start_route_ai_server(
             model_path=model_path, host=host, port=port, base_path=base_path